@@ -0,0 +1,279 @@
+import logging
+import os
+import sys
+import tempfile
+from typing import Iterable
+
+import numpy as np
+
+
+STORAGE_DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'int8': np.int8,
+}
+# Rows upcast and scored at a time, which bounds the memory of the compact search pass.
+CHUNK_ROWS = 4096
+
+
+class EmbeddingStore:
+    """
+    Compact, memory-mapped storage for node embeddings.
+
+    Vectors are L2-normalized on insertion, so cosine similarity reduces to a dot product. Every vector is stored twice
+    on disk: once at full precision (float32) and once in the compact storage mode (float16, or int8 with a per-vector
+    scale). In float32 mode both passes share the same file. Searches scan the compact vectors to select candidates,
+    then re-score those candidates at full precision. Only the pages touched by a search are paged in, so the full
+    precision copy does not stay resident. Without a path, the files live in a temporary directory that is removed by
+    close() or when the store is garbage collected.
+    """
+    def __init__(self, storage: str = 'int8', path: str = None, rescore_factor: int = 4, initial_capacity: int = 64):
+        """
+        Initialize the EmbeddingStore.
+        Args:
+            storage: The compact storage mode used for the first search pass, one of ['float32', 'float16', 'int8'].
+            path: The directory in which the memory-mapped files are created. A temporary directory owned by the store is
+                  used if None.
+            rescore_factor: The number of candidates re-scored at full precision, as a multiple of the requested top n.
+            initial_capacity: The number of vectors allocated before the files first need to grow.
+        """
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage mode '{storage}'. Expected one of {list(STORAGE_DTYPES)}.")
+        if rescore_factor < 1:
+            raise ValueError(f"rescore_factor must be at least 1, got {rescore_factor}.")
+        self.storage = storage
+        self._tempdir = tempfile.TemporaryDirectory(prefix='embeddings_') if path is None else None
+        self.path = self._tempdir.name if path is None else path
+        os.makedirs(self.path, exist_ok=True)
+        self.rescore_factor = rescore_factor
+        self.initial_capacity = max(1, initial_capacity)
+
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+        self.dim = None
+        self.capacity = 0
+        self._full = None
+        self._compact = None
+        self._scales = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.index
+
+    def close(self):
+        """
+        Flush the memory-mapped files and release them. The temporary directory, if the store owns one, is removed.
+        """
+        for memmap in (self._full, self._compact, self._scales):
+            if memmap is not None:
+                memmap.flush()
+        self._full = self._compact = self._scales = None
+        self.ids, self.index, self.capacity = [], {}, 0
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.dat")
+
+    def _open(self, name: str, dtype, shape: tuple[int, ...]) -> np.memmap:
+        """
+        Open (or create) a memory-mapped file, growing it to hold `shape` while preserving existing contents.
+        """
+        file = self._file(name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(file, 'ab') as f:
+            f.truncate(size)
+        return np.memmap(file, dtype=dtype, mode='r+', shape=shape)
+
+    def _grow(self, required: int):
+        if required <= self.capacity:
+            return
+        capacity = max(self.initial_capacity, self.capacity)
+        while capacity < required:
+            capacity *= 2
+        for memmap in (self._full, self._compact, self._scales):
+            if memmap is not None:
+                memmap.flush()
+        self._full = self._open('full', np.float32, (capacity, self.dim))
+        if self.storage == 'float32':
+            self._compact = self._full
+        else:
+            self._compact = self._open(self.storage, STORAGE_DTYPES[self.storage], (capacity, self.dim))
+        if self.storage == 'int8':
+            self._scales = self._open('scales', np.float32, (capacity,))
+        self.capacity = capacity
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(self, node_ids: Iterable[str], embeddings: Iterable[list[float]]):
+        """
+        Add or overwrite embeddings for a batch of nodes.
+        Args:
+            node_ids: The IDs of the nodes.
+            embeddings: The embeddings of the nodes, in the same order as node_ids.
+        """
+        node_ids = list(node_ids)
+        if not node_ids:
+            return
+        vectors = np.asarray(list(embeddings), dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(node_ids):
+            raise ValueError(f"Expected {len(node_ids)} embeddings, got an array of shape {vectors.shape}.")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dimension {self.dim}, got {vectors.shape[1]}.")
+        vectors = self._normalize(vectors)
+
+        rows = []
+        for node_id in node_ids:
+            if node_id not in self.index:
+                self.index[node_id] = len(self.ids)
+                self.ids.append(node_id)
+            rows.append(self.index[node_id])
+        self._grow(len(self.ids))
+
+        rows = np.asarray(rows)
+        self._full[rows] = vectors
+        if self.storage == 'int8':
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._compact[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+        elif self.storage != 'float32':
+            self._compact[rows] = vectors.astype(STORAGE_DTYPES[self.storage])
+
+    def get(self, node_id: str) -> np.ndarray:
+        """
+        Get the full precision (normalized) embedding of a node.
+        """
+        return np.array(self._full[self.index[node_id]])
+
+    def _compact_scores(self, query: np.ndarray) -> np.ndarray:
+        """
+        Score the query against the compact vectors, upcasting at most CHUNK_ROWS rows at a time.
+        """
+        n = len(self.ids)
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, n)
+            chunk = self._compact[start:end]
+            if self.storage != 'float32':
+                chunk = chunk.astype(np.float32)
+            scores[start:end] = chunk @ query
+        if self.storage == 'int8':
+            scores *= self._scales[:n]
+        return scores
+
+    def _compact_search(self, query: np.ndarray, num_candidates: int) -> np.ndarray:
+        """
+        Select the row indices of the num_candidates best matches of the compact vectors, sorted by descending score.
+        """
+        scores = self._compact_scores(query)
+        if num_candidates < len(scores):
+            candidates = np.argpartition(-scores, num_candidates - 1)[:num_candidates]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    def exact_scores(self, query: list[float]) -> dict[str, float]:
+        """
+        Compute the full precision cosine similarity between the query and every stored embedding.
+        """
+        query = self._normalize(np.asarray(query, dtype=np.float32))
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, len(self.ids))
+            scores[start:end] = self._full[start:end] @ query
+        return dict(zip(self.ids, scores.tolist()))
+
+    def search(self, query: list[float], top_n: int = 1) -> list[tuple[str, float]]:
+        """
+        Find the top N nodes by cosine similarity. The compact vectors select top_n * rescore_factor candidates, which
+        are then re-scored at full precision.
+        Args:
+            query: The query embedding.
+            top_n: The number of nodes to return.
+        Returns:
+            list: (node ID, score) pairs, sorted by descending full precision score.
+        """
+        n = len(self.ids)
+        if n == 0 or top_n < 1:
+            return []
+        query = self._normalize(np.asarray(query, dtype=np.float32))
+        num_candidates = min(n, top_n * self.rescore_factor)
+        if num_candidates == n:
+            candidates = np.arange(n)
+        else:
+            candidates = np.sort(self._compact_search(query, num_candidates))
+        exact = self._full[candidates] @ query
+        order = np.argsort(-exact, kind='stable')[:top_n]
+        return [(self.ids[candidates[i]], float(exact[i])) for i in order]
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Report the number of bytes used by the stored vectors.
+        Returns:
+            dict: The bytes used by the compact vectors (including int8 scales), by the full precision vectors, and by
+                  the same vectors stored as Python lists of floats, the storage this store replaces.
+        """
+        n = len(self.ids)
+        dim = self.dim or 0
+        compact = n * dim * np.dtype(STORAGE_DTYPES[self.storage]).itemsize
+        if self.storage == 'int8':
+            compact += n * np.dtype(np.float32).itemsize
+        return {
+            'vectors': n,
+            'dim': dim,
+            'compact_bytes': compact,
+            'full_bytes': n * dim * np.dtype(np.float32).itemsize,
+            'python_list_bytes': n * (sys.getsizeof([0.0] * dim) + dim * sys.getsizeof(0.0)),
+        }
+
+    def recall_at_k(self, queries: Iterable[list[float]], k: int = 1, rescore: bool = True) -> float:
+        """
+        Measure the recall@k of the search against exact full precision search.
+        Args:
+            queries: The query embeddings to evaluate.
+            k: The number of results compared per query.
+            rescore: Whether to evaluate search(), which re-scores candidates at full precision, or the compact first
+                     pass on its own.
+        Returns:
+            float: The fraction of exact top-k results that the search also returns, averaged over the queries.
+        """
+        hits, total = 0, 0
+        for query in queries:
+            exact = sorted(self.exact_scores(query).items(), key=lambda x: x[1], reverse=True)[:k]
+            expected = {node_id for node_id, _ in exact}
+            if rescore:
+                found = {node_id for node_id, _ in self.search(query, top_n=k)}
+            else:
+                query = self._normalize(np.asarray(query, dtype=np.float32))
+                found = {self.ids[i] for i in self._compact_search(query, min(k, len(self.ids)))}
+            hits += len(expected & found)
+            total += len(expected)
+        return hits / total if total else 1.0
+
+    def log_report(self, queries: Iterable[list[float]] = None, k: int = 1):
+        """
+        Log the memory use of the store and, if queries are given, the recall@k against exact search of both the
+        compact first pass on its own and the re-scored search.
+        """
+        usage = self.memory_usage()
+        logging.info(
+            f"Embedding store ({self.storage}): {usage['vectors']} vectors of dimension {usage['dim']}, "
+            f"{usage['compact_bytes']} bytes compact, {usage['full_bytes']} bytes full precision (memory-mapped), "
+            f"{usage['python_list_bytes']} bytes as Python lists of floats."
+        )
+        if queries is not None:
+            queries = list(queries)
+            logging.info(
+                f"Embedding store ({self.storage}) recall@{k}: "
+                f"{self.recall_at_k(queries, k, rescore=False):.3f} compact pass, "
+                f"{self.recall_at_k(queries, k):.3f} re-scored."
+            )
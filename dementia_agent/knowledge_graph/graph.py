@@ -1,7 +1,7 @@
 import abc
 from dataclasses import dataclass, asdict
 from enum import Enum, auto
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterable
 
 import networkx as nx
 
@@ -51,31 +51,76 @@ class EventData(NodeData):
 class KnowledgeGraph:
     def __init__(self):
         self._graph = nx.MultiDiGraph()
+        self._listeners: list[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """
+        Register a callback that is called with the ID of every node whose text (see node_to_text) changes.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, node_id: str):
+        for listener in self._listeners:
+            listener(node_id)
 
     def add_person(self, id: str, person_data: PersonData):
         self._graph.add_node(id, data=person_data)
+        self._notify(id)
         return id
 
     def add_event(self, id: str, event: EventData):
         self._graph.add_node(id, data=event)
+        self._notify(id)
         return id
 
     def connect(self, src: str, relation: str, dest: str, bidirectional: bool = False):
         self._graph.add_edge(src, dest, relation=relation)
+        self._notify(src)
         if bidirectional:
             self._graph.add_edge(dest, src, relation=relation)
+            self._notify(dest)
+
+    def add_nodes(self, nodes: Iterable[tuple[str, NodeData]]) -> list[str]:
+        """
+        Add a batch of people and/or events in a single graph update.
+
+        Args:
+            nodes: (node ID, node data) pairs.
+
+        Returns:
+            list[str]: The IDs of the added nodes.
+        """
+        nodes = list(nodes)
+        self._graph.add_nodes_from((id, {'data': data}) for id, data in nodes)
+        ids = [id for id, _ in nodes]
+        for id in ids:
+            self._notify(id)
+        return ids
+
+    def connect_many(self, connections: Iterable[tuple[str, str, str]]):
+        """
+        Add a batch of directed (src, relation, dest) connections in a single graph update.
+        """
+        connections = list(connections)
+        self._graph.add_edges_from((src, dest, {'relation': relation}) for src, relation, dest in connections)
+        for src in dict.fromkeys(src for src, _, _ in connections):
+            self._notify(src)
+
+    def has_node(self, id: str) -> bool:
+        return id in self._graph
 
     @classmethod
     def from_config(cls, people: dict[str, PersonData], events: dict[str, EventData], connections: list[tuple[str, str,
-    str]]):
+    str]], logs: list[str] = None):
         kg = KnowledgeGraph()
-        for id, person in people.items():
-            kg.add_person(id, person)
-        for id, event in events.items():
-            kg.add_event(id, event)
-
+        kg.add_nodes(people.items())
+        kg.add_nodes(events.items())
         for connection in connections:
             kg.connect(*connection)
+
+        if logs:
+            from dementia_agent.knowledge_graph.ingest import ingest
+            ingest(kg, logs)
         return kg
 
     def nodes_to_text(self, node_ids):
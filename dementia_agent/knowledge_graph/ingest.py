@@ -0,0 +1,336 @@
+import csv
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Iterable, Iterator
+
+from dementia_agent.knowledge_graph.graph import KnowledgeGraph, NodeData, PersonData, EventData
+
+
+RECORD_TYPES = ['person', 'event', 'relation']
+NODE_CLASSES = {'person': PersonData, 'event': EventData}
+RELATION_FIELDS = ['src', 'relation', 'dest', 'bidirectional']
+FILE_TYPES = ['.jsonl', '.csv']
+
+
+class IngestionError(ValueError):
+    """
+    Raised for records and files that cannot be ingested into the knowledge graph.
+    """
+
+
+@dataclass
+class IngestionReport:
+    """
+    Counts of the ingested and skipped records. Every input record counts once, even a bidirectional relation that is
+    inserted as two edges. seconds covers reading, validating and inserting the records, and embed_seconds the
+    embedding of the new nodes afterwards.
+    """
+    people: int = 0
+    events: int = 0
+    relations: int = 0
+    skipped: int = 0
+    skipped_files: int = 0
+    embedded: int = 0
+    seconds: float = 0.0
+    embed_seconds: float = 0.0
+
+    @property
+    def records(self) -> int:
+        return self.people + self.events + self.relations
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Ingested {self.records} records ({self.people} people, {self.events} events, {self.relations} relations)"
+            f" in {self.seconds:.2f}s ({self.records_per_second:.0f} records/s), skipped {self.skipped} records and"
+            f" {self.skipped_files} files, embedded {self.embedded} nodes in {self.embed_seconds:.2f}s."
+        )
+
+
+def check_path(path: str):
+    """
+    Check that a path is an existing .jsonl or .csv file, raising an IngestionError otherwise.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FILE_TYPES:
+        raise IngestionError(f"Unsupported file type '{extension}' for {path}. Expected one of {FILE_TYPES}.")
+    if not os.path.isfile(path):
+        raise IngestionError(f"File not found: {path}.")
+
+
+def read_records(path: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Stream records from a JSONL or CSV file, one at a time.
+
+    Every record has a 'type' field, one of ['person', 'event', 'relation'], and the fields of that type:
+    - person: id, name, age
+    - event: id, title, description, time, day, location
+    - relation: src, relation, dest, and optionally bidirectional
+    Any other non-empty fields of people and events are stored in misc.
+
+    Args:
+        path: The path of the .jsonl or .csv file.
+
+    Yields:
+        tuple[int, dict]: The line number and the raw record, or an error for malformed JSON lines and CSV rows.
+    """
+    check_path(path)
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.jsonl':
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, e
+        elif extension == '.csv':
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                if None in row:
+                    # DictReader collects cells beyond the header under the key None.
+                    yield line_number, IngestionError(f"Row has {len(row[None])} more cells than the header.")
+                else:
+                    yield line_number, {k: v for k, v in row.items() if v not in (None, '')}
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ['true', 'yes', '1']:
+        return True
+    if str(value).strip().lower() in ['false', 'no', '0', '']:
+        return False
+    raise IngestionError(f"Invalid boolean value: {value}.")
+
+
+def _parse_text(value: Any, field: str, subject: str) -> str:
+    if value is None or isinstance(value, (bool, dict, list)):
+        raise IngestionError(f"The {subject} has an invalid {field}: {value!r}.")
+    text = str(value).strip()
+    if not text:
+        raise IngestionError(f"The {subject} has an empty {field}.")
+    return text
+
+
+def _parse_age(value: Any, subject: str) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        age = value
+    elif isinstance(value, float) and value.is_integer():
+        age = int(value)
+    elif isinstance(value, str) and value.strip().isdigit():
+        age = int(value.strip())
+    else:
+        raise IngestionError(f"The {subject} has an invalid age: {value!r}.")
+    if age < 0:
+        raise IngestionError(f"The {subject} has a negative age: {age}.")
+    return age
+
+
+def validate_record(record: dict[str, Any]) -> tuple[str, Any]:
+    """
+    Validate a raw record and convert it to graph data. Text fields, including IDs, are stripped of surrounding
+    whitespace.
+
+    Args:
+        record: The raw record, as read by read_records.
+
+    Returns:
+        tuple: ('person' | 'event', (node ID, node data)) or ('relation', [(src, relation, dest), ...]).
+    """
+    if isinstance(record, Exception):
+        raise IngestionError(f"Malformed record: {record}")
+    if not isinstance(record, dict):
+        raise IngestionError(f"Malformed record: expected an object, got {type(record).__name__}.")
+    record = dict(record)
+    record_type = str(record.pop('type', '')).strip().lower()
+    if record_type not in RECORD_TYPES:
+        raise IngestionError(f"Invalid record type '{record_type}'. Expected one of {RECORD_TYPES}.")
+
+    if record_type == 'relation':
+        missing = [field for field in RELATION_FIELDS[:3] if field not in record]
+        if missing:
+            raise IngestionError(f"Relation is missing fields {missing}.")
+        src, relation, dest = (_parse_text(record[field], field, 'relation') for field in RELATION_FIELDS[:3])
+        connections = [(src, relation, dest)]
+        if _parse_bool(record.get('bidirectional', False)):
+            connections.append((dest, relation, src))
+        return record_type, connections
+
+    if 'id' not in record:
+        raise IngestionError(f"The {record_type} is missing an id.")
+    node_id = _parse_text(record.pop('id'), 'id', record_type)
+    subject = f"{record_type} '{node_id}'"
+    node_class = NODE_CLASSES[record_type]
+    required = [field.name for field in fields(node_class) if field.name not in ['misc', 'node_type']]
+    missing = [field for field in required if field not in record]
+    if missing:
+        raise IngestionError(f"The {subject} is missing fields {missing}.")
+
+    kwargs = {}
+    for field in required:
+        value = record.pop(field)
+        kwargs[field] = _parse_age(value, subject) if field == 'age' else _parse_text(value, field, subject)
+    misc = record.pop('misc', None) or {}
+    if not isinstance(misc, dict):
+        raise IngestionError(f"The misc field of the {subject} must be a mapping.")
+    misc.update(record)
+    return record_type, (node_id, node_class(**kwargs, misc=misc or None))
+
+
+class BulkLoader:
+    """
+    Buffers validated records and inserts them into the knowledge graph in batches. Nodes of a batch are inserted
+    before its relations. Relations that refer to nodes which are not in the graph yet are spilled to a temporary file
+    and retried by finish(), once all nodes are inserted, so records do not need to be ordered.
+    """
+    def __init__(self, knowledge_graph: KnowledgeGraph, batch_size: int = 1000, strict: bool = False):
+        """
+        Initialize the BulkLoader.
+        Args:
+            knowledge_graph: The knowledge graph to insert the records into.
+            batch_size: The number of records buffered before they are inserted.
+            strict: Whether to raise on invalid records instead of logging and skipping them.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}.")
+        self.knowledge_graph = knowledge_graph
+        self.batch_size = batch_size
+        self.strict = strict
+        self.report = IngestionReport()
+        self._nodes: list[tuple[str, tuple[str, NodeData]]] = []
+        self._relations: list[tuple[str, list[tuple[str, str, str]]]] = []
+        self._deferred = None
+
+    def _skip(self, source: str, error: Exception):
+        if self.strict:
+            raise IngestionError(f"{source}: {error}") from error
+        logging.warning(f"Skipping record at {source}: {error}")
+        self.report.skipped += 1
+
+    def add(self, record: dict[str, Any], source: str = ''):
+        """
+        Validate a record and buffer it, inserting the buffer once it holds batch_size records.
+        """
+        try:
+            record_type, payload = validate_record(record)
+        except IngestionError as e:
+            self._skip(source, e)
+            return
+        if record_type == 'relation':
+            self._relations.append((source, payload))
+        else:
+            self._nodes.append((source, payload))
+        if len(self._nodes) + len(self._relations) >= self.batch_size:
+            self.flush()
+
+    def _insert_relations(self, final: bool):
+        """
+        Insert the buffered relations whose nodes exist. The others are deferred, or skipped if final.
+        """
+        resolved = []
+        for source, connections in self._relations:
+            unknown = sorted({
+                node_id for src, _, dest in connections for node_id in (src, dest)
+                if not self.knowledge_graph.has_node(node_id)
+            })
+            if not unknown:
+                resolved.extend(connections)
+                self.report.relations += 1
+            elif final:
+                self._skip(source, IngestionError(f"Relation refers to unknown nodes {unknown}."))
+            else:
+                if self._deferred is None:
+                    self._deferred = tempfile.TemporaryFile('w+', encoding='utf-8')
+                self._deferred.write(json.dumps([source, connections]) + "\n")
+        self.knowledge_graph.connect_many(resolved)
+        self._relations.clear()
+
+    def flush(self):
+        """
+        Insert all buffered records into the knowledge graph, deferring relations to nodes that do not exist yet.
+        """
+        new_nodes = {}
+        for source, (node_id, data) in self._nodes:
+            if node_id in new_nodes or self.knowledge_graph.has_node(node_id):
+                self._skip(source, IngestionError(f"Node '{node_id}' already exists."))
+            else:
+                new_nodes[node_id] = data
+        self.knowledge_graph.add_nodes(new_nodes.items())
+        self.report.people += sum(isinstance(data, PersonData) for data in new_nodes.values())
+        self.report.events += sum(isinstance(data, EventData) for data in new_nodes.values())
+        self._nodes.clear()
+        self._insert_relations(final=False)
+
+    def finish(self):
+        """
+        Insert all buffered records, then retry the deferred relations in batches. Relations that still refer to
+        unknown nodes are skipped.
+        """
+        self.flush()
+        if self._deferred is None:
+            return
+        self._deferred.seek(0)
+        for line in self._deferred:
+            source, connections = json.loads(line)
+            self._relations.append((source, [tuple(connection) for connection in connections]))
+            if len(self._relations) >= self.batch_size:
+                self._insert_relations(final=True)
+        self._insert_relations(final=True)
+        self._deferred.close()
+        self._deferred = None
+
+
+def ingest(
+        knowledge_graph: KnowledgeGraph,
+        paths: Iterable[str],
+        batch_size: int = 1000,
+        strict: bool = False,
+        retriever=None
+) -> IngestionReport:
+    """
+    Stream care logs from JSONL/CSV files into the knowledge graph. Records are validated and inserted in batches, so
+    memory use is bounded by the batch size rather than the size of the logs. See read_records for the record format.
+    Records may come in any order: relations to nodes that appear later in the logs are inserted in a final pass.
+    Missing files and files of an unsupported type are logged and skipped, like invalid records, unless strict.
+
+    Args:
+        knowledge_graph: The knowledge graph to insert the records into.
+        paths: The paths of the .jsonl or .csv files, ingested in order.
+        batch_size: The number of records inserted (and nodes embedded) per batch.
+        strict: Whether to raise on invalid records and files instead of logging and skipping them.
+        retriever: If given, the new nodes are embedded with this Retriever once all records are inserted.
+
+    Returns:
+        IngestionReport: The number of ingested and skipped records and the ingestion throughput.
+    """
+    start = time.perf_counter()
+    loader = BulkLoader(knowledge_graph, batch_size=batch_size, strict=strict)
+    for path in paths:
+        try:
+            check_path(path)
+        except IngestionError as e:
+            if strict:
+                raise
+            logging.error(f"Skipping care logs: {e}")
+            loader.report.skipped_files += 1
+            continue
+        logging.info(f"Ingesting care logs from {path}.")
+        for line_number, record in read_records(path):
+            loader.add(record, source=f"{path}:{line_number}")
+    loader.finish()
+    loader.report.seconds = time.perf_counter() - start
+
+    if retriever is not None:
+        start = time.perf_counter()
+        loader.report.embedded = retriever.update_node_embeddings(batch_size=batch_size)
+        loader.report.embed_seconds = time.perf_counter() - start
+    logging.info(str(loader.report))
+    return loader.report
@@ -0,0 +1,127 @@
+import math
+import re
+from collections import Counter
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'did', 'do', 'does', 'for', 'from', 'has', 'have', 'he', 'her',
+    'his', 'how', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'she', 'that', 'the', 'their', 'them',
+    'they', 'this', 'to', 'was', 'were', 'what', 'when', 'where', 'which', 'who', 'whom', 'why', 'with', 'you', 'your',
+})
+DEFAULT_FIELD_WEIGHTS = {'name': 3.0, 'text': 1.0}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase alphanumeric tokens, dropping stopwords. Underscores separate tokens, so node IDs such as
+    nurse_nora match queries like "Nurse Nora".
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    Inverted index over node text with BM25F scoring. Every node is indexed as a set of weighted fields, e.g. a short,
+    boosted 'name' field with the node's own ID and name or title, and a 'text' field with its full text. Documents can
+    be added, replaced and removed one at a time, so the index can follow mutations of the knowledge graph without
+    being rebuilt.
+    """
+    def __init__(self, field_weights: dict[str, float] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize the LexicalIndex.
+        Args:
+            field_weights: The weight of the term frequencies of every field. Defaults to DEFAULT_FIELD_WEIGHTS.
+            k1: The BM25 term frequency saturation parameter.
+            b: The BM25 document length normalization parameter, applied per field.
+        """
+        self.field_weights = dict(field_weights or DEFAULT_FIELD_WEIGHTS)
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[str, dict[str, int]]] = {}
+        self.doc_terms: dict[str, list[str]] = {}
+        self.doc_lengths: dict[str, dict[str, int]] = {}
+        self.total_lengths = {field: 0 for field in self.field_weights}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.doc_lengths
+
+    def remove(self, node_id: str):
+        """
+        Remove a node from the index. Removing an unknown node is a no-op.
+        """
+        if node_id not in self.doc_lengths:
+            return
+        for field, length in self.doc_lengths.pop(node_id).items():
+            self.total_lengths[field] -= length
+        for term in self.doc_terms.pop(node_id):
+            docs = self.postings[term]
+            del docs[node_id]
+            if not docs:
+                del self.postings[term]
+
+    def update(self, node_id: str, fields: dict[str, str]):
+        """
+        Index the fields of a node, replacing any previously indexed fields of the same node.
+        Args:
+            node_id: The ID of the node.
+            fields: The text of every field. Fields without a weight in field_weights are rejected.
+        """
+        unknown = set(fields) - set(self.field_weights)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}. Expected any of {list(self.field_weights)}.")
+        self.remove(node_id)
+        lengths = {field: 0 for field in self.field_weights}
+        terms = set()
+        for field, text in fields.items():
+            tokens = tokenize(text)
+            for term, freq in Counter(tokens).items():
+                self.postings.setdefault(term, {}).setdefault(node_id, {})[field] = freq
+            terms.update(tokens)
+            lengths[field] = len(tokens)
+            self.total_lengths[field] += len(tokens)
+        self.doc_lengths[node_id] = lengths
+        self.doc_terms[node_id] = list(terms)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - df + 0.5) / (df + 0.5))
+
+    def max_score(self, query: str) -> float:
+        """
+        The upper bound of the BM25F score of the query, reached as the term frequencies of all query terms go to
+        infinity. Scores divided by it are comparable across queries and index sizes.
+        """
+        return sum(self.idf(term) * (self.k1 + 1) for term in set(tokenize(query)) if term in self.postings)
+
+    def search(self, query: str, top_n: int = None) -> list[tuple[str, float]]:
+        """
+        Score the indexed nodes against the query using BM25F.
+        Args:
+            query: The query to match against the node text.
+            top_n: The number of nodes to return. All matching nodes are returned if None.
+        Returns:
+            list: (node ID, score) pairs of the nodes that match at least one query term, sorted by descending score.
+        """
+        if not self.doc_lengths:
+            return []
+        avg_lengths = {field: total / len(self.doc_lengths) or 1.0 for field, total in self.total_lengths.items()}
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf(term)
+            for node_id, field_freqs in docs.items():
+                lengths = self.doc_lengths[node_id]
+                freq = sum(
+                    self.field_weights[field] * field_freq
+                    / (1 - self.b + self.b * lengths[field] / avg_lengths[field])
+                    for field, field_freq in field_freqs.items()
+                )
+                scores[node_id] = scores.get(node_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + self.k1)
+        sorted_nodes = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return sorted_nodes[:top_n] if top_n is not None else sorted_nodes
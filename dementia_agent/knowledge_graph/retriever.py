@@ -1,20 +1,33 @@
 import logging
 import ollama
 import time
-from build.lib.dementia_agent.knowledge_graph.visualize import visualize_graph
+from dementia_agent.knowledge_graph.visualize import visualize_graph
+from dementia_agent.knowledge_graph.embedding_store import EmbeddingStore
 from dementia_agent.knowledge_graph.graph import KnowledgeGraph, NodeType, EventData, PersonData
+from dementia_agent.knowledge_graph.lexical_index import LexicalIndex
 
 
-def cosine_similarity(a, b):
-  dot_product = sum([x * y for x, y in zip(a, b)])
-  norm_a = sum([x ** 2 for x in a]) ** 0.5
-  norm_b = sum([x ** 2 for x in b]) ** 0.5
-  return dot_product / (norm_a * norm_b)
-
+FUSION_METHODS = ['rrf', 'linear']
+RRF_K = 60
 
 
 class Retriever:
-    def __init__(self, knowledge_graph: KnowledgeGraph, embedding_model: str, retrieval_distance: int = 0):
+    def __init__(
+            self,
+            knowledge_graph: KnowledgeGraph,
+            embedding_model: str,
+            retrieval_distance: int = 0,
+            embedding_storage: str = 'int8',
+            embedding_path: str = None,
+            rescore_factor: int = 4,
+            fusion: str = 'rrf',
+            lexical_weight: float = 0.5,
+            lexical_threshold: float = 0.75,
+            lexical_margin: float = 1.5,
+            candidate_depth: int = 10,
+            embedding_batch_size: int = 64,
+            visualize_updates: bool = True
+    ):
         """
         Initialize the Retriever.
         Args:
@@ -23,44 +36,163 @@ class Retriever:
             retrieval_distance: The distance between a matching node and the adjacent nodes included in the retrieval.
                                 With 0, only the matching node is included, while with 1, the matching node and its
                                 direct neighbors are included.
+            embedding_storage: The compact storage mode of the node embeddings, one of ['float32', 'float16', 'int8'].
+            embedding_path: The directory for the memory-mapped embedding files. A temporary directory is used if None.
+            rescore_factor: The number of search candidates re-scored at full precision, as a multiple of top_n.
+            fusion: How lexical (BM25F) and embedding scores are combined, one of ['rrf', 'linear']. 'rrf' uses
+                    reciprocal rank fusion, 'linear' a weighted sum of min-max normalized scores.
+            lexical_weight: The weight of the lexical scores in the fusion, between 0 and 1. The embedding scores are
+                            weighted by 1 - lexical_weight.
+            lexical_threshold: The score the best lexical match needs before it is considered confident, as a fraction
+                               of the maximum possible BM25F score of the query.
+            lexical_margin: The factor by which the best lexical match must outscore the best match that is not
+                            returned to be considered confident. For confident lexical matches, the query embedding is
+                            skipped entirely.
+            candidate_depth: The number of candidates taken from both the lexical and the embedding search before
+                             they are fused. At least top_n + 1 lexical candidates are always taken.
+            embedding_batch_size: The number of nodes embedded per request to the embedding model.
+            visualize_updates: Whether to re-render the graph visualization after every add_event call.
         """
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method '{fusion}'. Expected one of {FUSION_METHODS}.")
         self.knowledge_graph = knowledge_graph
         self.embedding_model = embedding_model
         ollama.pull(embedding_model)
         self.retrieval_distance = retrieval_distance
-        self.embeds = {}
+        self.embeds = EmbeddingStore(storage=embedding_storage, path=embedding_path, rescore_factor=rescore_factor)
+        self.fusion = fusion
+        self.lexical_weight = lexical_weight
+        self.lexical_threshold = lexical_threshold
+        self.lexical_margin = lexical_margin
+        self.candidate_depth = candidate_depth
+        self.embedding_batch_size = embedding_batch_size
+        self.visualize_updates = visualize_updates
+
+        # The lexical index and embeddings are refreshed lazily, so bursts of graph mutations only re-index and
+        # re-embed each node once.
+        self.lexical_index = LexicalIndex()
+        self._stale_lexical = set(self.knowledge_graph.get_nodes())
+        self.knowledge_graph.add_listener(self._stale_lexical.add)
+        self._stale_embeds = set(self.knowledge_graph.get_nodes())
+        self.knowledge_graph.add_listener(self._stale_embeds.add)
 
     def compute_node_embeddings(self):
         """
         Compute and store embeddings for all nodes in the knowledge graph using the specified embedding model.
         """
         logging.info("Computing node embeddings.")
-        nodes = self.knowledge_graph._graph.nodes(data=True)
-        nodes = {node_id: self.knowledge_graph.node_to_text(node_id) for node_id, data in nodes if node_id != 'user'}
-        for node_id, text in nodes.items():
-            embedding = ollama.embed(input=text, model=self.embedding_model)['embeddings'][0]
-            self.embeds[node_id] = embedding
+        self._stale_embeds.update(self.knowledge_graph.get_nodes())
+        self.update_node_embeddings()
+        self.embeds.log_report()
+
+    def update_node_embeddings(self, batch_size: int = None) -> int:
+        """
+        Embed the nodes that were added or changed since they were last embedded, in batches.
+        Args:
+            batch_size: The number of nodes embedded per request to the embedding model. Defaults to
+                        embedding_batch_size.
+        Returns:
+            int: The number of embedded nodes.
+        """
+        batch_size = batch_size or self.embedding_batch_size
+        self._stale_embeds.discard('user')
+        node_ids = list(self._stale_embeds)
+        for start in range(0, len(node_ids), batch_size):
+            batch = node_ids[start:start + batch_size]
+            texts = [self.knowledge_graph.node_to_text(node_id) for node_id in batch]
+            self.embeds.add(batch, ollama.embed(input=texts, model=self.embedding_model)['embeddings'])
+            # Only mark nodes as embedded once they are stored, so a failing batch is retried on the next call.
+            self._stale_embeds.difference_update(batch)
+        return len(node_ids)
+
+    def lexical_search(self, query: str, top_n: int = None) -> list[tuple[str, float]]:
+        """
+        Score the nodes in the knowledge graph against the query with BM25F. The node ID and its name or title are
+        indexed as a boosted 'name' field, separately from the full node text, which also mentions the IDs of
+        connected nodes.
+        Args:
+            query: The query to match against the node text.
+            top_n: The number of top matching nodes to return. All matching nodes are returned if None.
+        Returns:
+            list: (node ID, score) pairs, sorted by descending score.
+        """
+        for node_id in self._stale_lexical:
+            if node_id != 'user':
+                data = self.knowledge_graph._graph.nodes[node_id]['data'].to_dict()
+                self.lexical_index.update(node_id, {
+                    'name': f"{node_id}\n{data.get('name') or data.get('title') or ''}",
+                    'text': self.knowledge_graph.node_to_text(node_id),
+                })
+        self._stale_lexical.clear()
+        return self.lexical_index.search(query, top_n=top_n)
 
+    def is_confident(self, query: str, lexical_nodes: list[tuple[str, float]], top_n: int = 1) -> bool:
+        """
+        Check whether the top N lexical matches are confident enough to skip the embedding search. The best match must
+        reach lexical_threshold of the maximum possible score of the query, and outscore the best match that is not
+        returned by lexical_margin.
+        Args:
+            query: The query that was matched.
+            lexical_nodes: (node ID, score) pairs from the lexical search, sorted by descending score.
+            top_n: The number of matches that will be returned.
+        """
+        if not lexical_nodes or lexical_nodes[0][1] < self.lexical_threshold * self.lexical_index.max_score(query):
+            return False
+        return len(lexical_nodes) <= top_n or lexical_nodes[0][1] >= self.lexical_margin * lexical_nodes[top_n][1]
+
+    def fuse(self, lexical_nodes: list[tuple[str, float]], embedding_nodes: list[tuple[str, float]]) -> list[tuple[str, float]]:
+        """
+        Combine lexical and embedding rankings into a single ranking.
+        Args:
+            lexical_nodes: (node ID, score) pairs from the lexical search, sorted by descending score.
+            embedding_nodes: (node ID, score) pairs from the embedding search, sorted by descending score.
+        Returns:
+            list: (node ID, fused score) pairs, sorted by descending fused score.
+        """
+        scores = {}
+        for weight, ranking in ((self.lexical_weight, lexical_nodes), (1 - self.lexical_weight, embedding_nodes)):
+            if not ranking:
+                continue
+            if self.fusion == 'rrf':
+                contributions = {node_id: 1 / (RRF_K + rank) for rank, (node_id, _) in enumerate(ranking, start=1)}
+            else:
+                high, low = ranking[0][1], ranking[-1][1]
+                contributions = {
+                    node_id: (score - low) / (high - low) if high > low else 1.0 for node_id, score in ranking
+                }
+            for node_id, contribution in contributions.items():
+                scores[node_id] = scores.get(node_id, 0.0) + weight * contribution
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
 
     def get_matching_node(self, query: str, top_n: int = 1) -> list[str]:
         """
-        Retrieve the top N nodes that match the query based on cosine similarity of their embeddings.
+        Retrieve the top N nodes that match the query. Lexical (BM25F) matches on the node text are used directly when
+        they are confident. Otherwise, they are fused with the cosine similarity of the node embeddings.
         Args:
-            query: The query to match against the node embeddings.
+            query: The query to match against the nodes.
             top_n: The number of top matching nodes to return.
         Returns:
-            list: A list of node IDs that match the query, sorted by similarity score.
+            list: A list of node IDs that match the query, sorted by score.
         """
-        if not self.embeds:
-            self.compute_node_embeddings()
-        query_embed = ollama.embed(input=query, model=self.embedding_model)['embeddings'][0]
-        scores = {node_id : cosine_similarity(query_embed, node_embed) for node_id, node_embed in self.embeds.items()}
-        sorted_nodes = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        # At least one lexical match beyond top_n is needed to check the lexical margin.
+        depth = max(top_n + 1, self.candidate_depth)
+        lexical_nodes = self.lexical_search(query, top_n=depth)
+        if self.is_confident(query, lexical_nodes, top_n=top_n):
+            sorted_nodes = lexical_nodes[:top_n]
+            logging.info(f"Confident lexical match for query '{query}', skipping query embedding.")
+        else:
+            if not self.embeds:
+                self.compute_node_embeddings()
+            else:
+                self.update_node_embeddings()
+            query_embed = ollama.embed(input=query, model=self.embedding_model)['embeddings'][0]
+            embedding_nodes = self.embeds.search(query_embed, top_n=depth)
+            sorted_nodes = self.fuse(lexical_nodes, embedding_nodes)[:top_n]
         logging.info(
             f"Retrieval scores for query '{query}':\n" +
             "\n".join([ f"{node_id}: {score}" for node_id, score in sorted_nodes])
         )
-        return list(zip(*sorted_nodes))[0][:top_n]
+        return [node_id for node_id, _ in sorted_nodes]
 
 
     def get_initial_context(
@@ -149,7 +281,7 @@ class Retriever:
         """
         try:
             # Create event
-            if event not in self.knowledge_graph._graph:
+            if not self.knowledge_graph.has_node(event):
                 self.knowledge_graph.add_event(event, event=EventData(
                     title=event,
                     description=description,
@@ -160,10 +292,11 @@ class Retriever:
 
             # Add connections
             for node_name in node_names:
-                if node_name in self.knowledge_graph.get_nodes():
+                if self.knowledge_graph.has_node(node_name):
                     self.knowledge_graph.connect(node_name, predicate, event)
                     print("Added:", node_name, predicate, event)
-            visualize_graph(self.knowledge_graph)
+            if self.visualize_updates:
+                visualize_graph(self.knowledge_graph)
             return f"Successfully added {event} to the knowledge graph"
 
         except Exception as e:
@@ -0,0 +1,45 @@
+import logging
+
+import hydra
+import ollama
+from hydra.utils import instantiate
+
+from dementia_agent.knowledge_graph.embedding_store import EmbeddingStore, STORAGE_DTYPES
+from dementia_agent.knowledge_graph.retriever import Retriever
+
+
+QUERIES = [
+    "Who is Nurse Nora?",
+    "When does the user drink morning coffee?",
+    "What happened to Arthur?",
+    "When should the user take their medicine?",
+    "Who are the children of the user?",
+]
+
+
+@hydra.main(config_path="../configs", config_name="config.yaml", version_base='1.2')
+def embedding_report(cfg):
+    """
+    Report the memory use of every embedding storage mode against Python lists of floats, and the recall@k of its
+    compact first pass and of the re-scored search against exact full precision search.
+    """
+    logging.getLogger().setLevel(logging.INFO)
+    retriever: Retriever = instantiate(cfg.agent.retriever, _convert_='object')
+    retriever.compute_node_embeddings()
+    ids = list(retriever.embeds.ids)
+    embeddings = [retriever.embeds.get(node_id) for node_id in ids]
+    queries = ollama.embed(input=QUERIES, model=retriever.embedding_model)['embeddings']
+
+    for storage in STORAGE_DTYPES:
+        store = EmbeddingStore(storage=storage, rescore_factor=retriever.embeds.rescore_factor)
+        try:
+            store.add(ids, embeddings)
+            for k in (1, 2):
+                store.log_report(queries, k=k)
+        finally:
+            store.close()
+    retriever.embeds.close()
+
+
+if __name__ == "__main__":
+    embedding_report()
@@ -0,0 +1,31 @@
+import logging
+
+import hydra
+from hydra.utils import instantiate
+
+from dementia_agent.knowledge_graph.ingest import ingest
+from dementia_agent.knowledge_graph.retriever import Retriever
+
+
+@hydra.main(config_path="../configs", config_name="config.yaml", version_base='1.2')
+def ingest_logs(cfg):
+    """
+    Stream care logs into the knowledge graph, embed the new nodes and report the ingestion throughput. The graph is
+    discarded afterwards, so this only benchmarks ingestion. To import logs for the agent, list them under `logs` in
+    knowledge_graph.yaml.
+
+    Usage: python -m scripts.ingest_logs +paths=[logs/2025-01.jsonl,logs/2025-02.csv] +batch_size=1000
+    """
+    logging.getLogger().setLevel(logging.INFO)
+    retriever: Retriever = instantiate(cfg.agent.retriever, _convert_='object')
+    ingest(
+        retriever.knowledge_graph,
+        cfg.paths,
+        batch_size=cfg.get('batch_size', 1000),
+        retriever=retriever
+    )
+    retriever.embeds.close()
+
+
+if __name__ == "__main__":
+    ingest_logs()
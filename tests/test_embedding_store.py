@@ -0,0 +1,92 @@
+import os
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from dementia_agent.knowledge_graph import embedding_store
+from dementia_agent.knowledge_graph.embedding_store import EmbeddingStore
+
+
+def make_data(num_vectors=500, dim=64, num_queries=20):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(num_vectors, dim))
+    # Queries near stored vectors, so the exact top-k is well separated.
+    num_queries = min(num_queries, num_vectors)
+    queries = vectors[:num_queries] + 0.3 * rng.normal(size=(num_queries, dim))
+    return [f"n{i}" for i in range(num_vectors)], vectors, queries
+
+
+@pytest.mark.parametrize('storage', ['float32', 'float16', 'int8'])
+def test_search_recall_against_exact(storage):
+    ids, vectors, queries = make_data()
+    store = EmbeddingStore(storage=storage, rescore_factor=4, initial_capacity=8)
+    try:
+        # Add in batches, so the memory-mapped files grow several times.
+        for start in range(0, len(ids), 100):
+            store.add(ids[start:start + 100], vectors[start:start + 100])
+        assert len(store) == len(ids)
+        assert store.recall_at_k(queries, k=5, rescore=False) >= 0.9
+        assert store.recall_at_k(queries, k=5) == 1.0
+        node_id, score = store.search(vectors[3], top_n=1)[0]
+        assert node_id == 'n3'
+        assert score == pytest.approx(1.0, abs=1e-5)
+    finally:
+        store.close()
+
+
+def test_add_overwrites_existing_node():
+    ids, vectors, _ = make_data(num_vectors=10)
+    store = EmbeddingStore(storage='int8')
+    try:
+        store.add(ids, vectors)
+        store.add(['n0'], [vectors[5]])
+        assert len(store) == 10
+        assert np.allclose(store.get('n0'), store.get('n5'))
+    finally:
+        store.close()
+
+
+def test_memory_usage():
+    ids, vectors, _ = make_data(num_vectors=10, dim=32)
+    store = EmbeddingStore(storage='int8')
+    try:
+        store.add(ids, vectors)
+        usage = store.memory_usage()
+        assert usage['compact_bytes'] == 10 * 32 + 10 * 4
+        assert usage['full_bytes'] == 10 * 32 * 4
+        assert usage['python_list_bytes'] > usage['full_bytes']
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize('storage', ['float32', 'float16', 'int8'])
+def test_search_memory_is_bounded_by_chunks(storage, monkeypatch):
+    monkeypatch.setattr(embedding_store, 'CHUNK_ROWS', 256)
+    ids, vectors, queries = make_data(num_vectors=4096, dim=128)
+    store = EmbeddingStore(storage=storage, rescore_factor=2)
+    try:
+        store.add(ids, vectors)
+        tracemalloc.start()
+        store.search(queries[0], top_n=2)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert peak < store.memory_usage()['full_bytes'] / 4
+    finally:
+        store.close()
+
+
+def test_close_removes_temporary_directory():
+    store = EmbeddingStore()
+    store.add(['a'], [[1.0, 0.0]])
+    path = store.path
+    assert os.path.isdir(path)
+    store.close()
+    assert not os.path.exists(path)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        EmbeddingStore(storage='int4')
+    with pytest.raises(ValueError):
+        EmbeddingStore(rescore_factor=0)
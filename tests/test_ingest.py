@@ -0,0 +1,146 @@
+import json
+import time
+
+import pytest
+
+import ollama
+
+from dementia_agent.knowledge_graph.graph import KnowledgeGraph, PersonData
+from dementia_agent.knowledge_graph.ingest import IngestionError, ingest, validate_record
+
+
+def write_jsonl(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(record if isinstance(record, str) else json.dumps(record))
+            f.write("\n")
+    return str(path)
+
+
+def person(id, name='Jane Doe', age=57, **misc):
+    return {'type': 'person', 'id': id, 'name': name, 'age': age, **misc}
+
+
+def event(id, title='Bingo'):
+    return {
+        'type': 'event', 'id': id, 'title': title, 'description': 'Played bingo.', 'time': '14:00', 'day': 'Friday',
+        'location': 'Common Room'
+    }
+
+
+def relation(src, dest, bidirectional=False):
+    return {'type': 'relation', 'src': src, 'relation': 'participates_in', 'dest': dest, 'bidirectional': bidirectional}
+
+
+def test_counts_and_skips_per_record(tmp_path):
+    path = write_jsonl(tmp_path / 'logs.jsonl', [
+        person('jane'),
+        person('john', name='John Doe'),
+        event('bingo'),
+        event('walk', title='Walk'),
+        relation('jane', 'bingo', bidirectional=True),
+        relation('john', 'bingo', bidirectional=True),
+        relation('jane', 'walk'),
+        '{not json',
+        person('jane'),
+        relation('jane', 'nobody', bidirectional=True),
+        {'type': 'meal', 'id': 'lunch'},
+    ])
+    kg = KnowledgeGraph()
+    report = ingest(kg, [path], batch_size=3)
+    assert (report.people, report.events, report.relations, report.skipped) == (2, 2, 3, 4)
+    assert report.records == 7
+    assert set(kg.get_nodes()) == {'jane', 'john', 'bingo', 'walk'}
+    assert kg._graph.number_of_edges() == 5
+    assert 'participates_in bingo' in kg.node_to_text('jane')
+    assert 'participates_in jane' in kg.node_to_text('bingo')
+
+
+def test_relations_before_their_nodes(tmp_path):
+    path = write_jsonl(tmp_path / 'logs.jsonl', [relation('jane', 'bingo'), person('jane'), event('bingo')])
+    kg = KnowledgeGraph()
+    report = ingest(kg, [path], batch_size=2)
+    assert (report.relations, report.skipped) == (1, 0)
+    assert 'participates_in bingo' in kg.node_to_text('jane')
+
+
+def test_csv_records_are_stripped(tmp_path):
+    path = tmp_path / 'logs.csv'
+    path.write_text(
+        "type,id,name,age,src,relation,dest,hobby\n"
+        "person, jane ,Jane Doe,57,,,,\n"
+        "person,bob,Bob, 70,,,,chess\n"
+        "relation,,,, bob ,friend_of,jane ,\n"
+        "person,carl,Carl,70,,,,,extra1,extra2\n"
+    )
+    kg = KnowledgeGraph()
+    kg.add_person('user', PersonData(name='Mary', age=80))
+    report = ingest(kg, [str(path)])
+    assert (report.people, report.relations, report.skipped) == (2, 1, 1)
+    assert not kg.has_node('carl')
+    assert kg._graph.nodes['bob']['data'].misc == {'hobby': 'chess'}
+    assert kg._graph.nodes['bob']['data'].age == 70
+    assert 'friend_of jane' in kg.node_to_text('bob')
+
+
+@pytest.mark.parametrize('record', [
+    person('jane', name=None),
+    person('jane', name='  '),
+    person('jane', age='old'),
+    person('jane', age=True),
+    person('jane', age=57.5),
+    person('jane', age=-1),
+    person(' '),
+    {**event('bingo'), 'title': {'text': 'Bingo'}},
+    relation('jane', None),
+    {'type': 'relation', 'src': 'jane', 'dest': 'bingo'},
+    {**relation('jane', 'bingo'), 'bidirectional': 'maybe'},
+    ['person', 'jane'],
+])
+def test_validate_record_rejects_invalid_records(record):
+    with pytest.raises(IngestionError):
+        validate_record(record)
+
+
+def test_validate_record_accepts_numeric_strings():
+    record_type, (node_id, data) = validate_record(person(' jane ', age='57', religion='atheist'))
+    assert record_type == 'person'
+    assert node_id == 'jane'
+    assert data.age == 57
+    assert data.misc == {'religion': 'atheist'}
+
+
+def test_strict_mode_raises(tmp_path):
+    path = write_jsonl(tmp_path / 'logs.jsonl', [person('jane'), person('jane')])
+    with pytest.raises(IngestionError):
+        ingest(KnowledgeGraph(), [path], strict=True)
+
+
+def test_bad_paths_are_skipped_unless_strict(tmp_path):
+    path = write_jsonl(tmp_path / 'logs.jsonl', [person('jane')])
+    unsupported = tmp_path / 'logs.txt'
+    unsupported.write_text('jane')
+    missing = str(tmp_path / 'missing.jsonl')
+    report = ingest(KnowledgeGraph(), [missing, str(unsupported), path])
+    assert (report.people, report.skipped_files) == (1, 2)
+    for bad_path in (missing, str(unsupported)):
+        with pytest.raises(IngestionError):
+            ingest(KnowledgeGraph(), [bad_path], strict=True)
+
+
+def test_embedding_time_is_reported_separately(tmp_path, monkeypatch):
+    from dementia_agent.knowledge_graph.retriever import Retriever
+
+    def slow_embed(input, model):
+        time.sleep(0.2)
+        return {'embeddings': [[1.0, float(i)] for i in range(len(input))]}
+
+    monkeypatch.setattr(ollama, 'pull', lambda model: None)
+    monkeypatch.setattr(ollama, 'embed', slow_embed)
+    path = write_jsonl(tmp_path / 'logs.jsonl', [person('jane'), event('bingo'), relation('jane', 'bingo')])
+    kg = KnowledgeGraph()
+    retriever = Retriever(kg, 'all-minilm', visualize_updates=False)
+    report = ingest(kg, [path], retriever=retriever)
+    assert report.embedded == 2
+    assert report.embed_seconds >= 0.2
+    assert report.seconds < report.embed_seconds
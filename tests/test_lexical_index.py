@@ -0,0 +1,56 @@
+import pytest
+
+from dementia_agent.knowledge_graph.lexical_index import LexicalIndex, tokenize
+
+
+def make_index():
+    index = LexicalIndex()
+    index.update('nurse_nora', {'name': 'nurse_nora\nNora', 'text': 'Nora is one of the nurses. gives medicine.'})
+    index.update('medicine', {'name': 'medicine\nMedicine', 'text': 'Taking medicine every morning. with nurse_nora.'})
+    index.update('morning_coffee', {'name': 'morning_coffee\nMorning Coffee', 'text': 'Coffee with jane.'})
+    index.update('jane', {'name': 'jane\nJane Doe', 'text': 'participates_in morning_coffee.'})
+    return index
+
+
+def test_tokenize_splits_ids_and_drops_stopwords():
+    assert tokenize("Who is Nurse_Nora?") == ['nurse', 'nora']
+
+
+def test_name_field_outranks_edge_mentions():
+    index = make_index()
+    results = index.search('morning coffee')
+    assert [node_id for node_id, _ in results[:2]] == ['morning_coffee', 'jane']
+    assert results[0][1] > 1.5 * results[1][1]
+    assert results[0][1] <= index.max_score('morning coffee')
+
+
+def test_update_replaces_document():
+    index = make_index()
+    index.update('jane', {'name': 'jane\nJane Doe', 'text': 'likes bingo.'})
+    assert len(index) == 4
+    assert [node_id for node_id, _ in index.search('bingo')] == ['jane']
+    assert 'jane' not in dict(index.search('coffee'))
+    assert 'participates' not in index.postings
+
+
+def test_remove():
+    index = make_index()
+    index.remove('nurse_nora')
+    index.remove('unknown')
+    assert 'nurse_nora' not in index
+    assert len(index) == 3
+    assert 'nurses' not in index.postings
+    assert [node_id for node_id, _ in index.search('nora')] == ['medicine']
+    assert sum(index.total_lengths.values()) == sum(sum(lengths.values()) for lengths in index.doc_lengths.values())
+
+
+def test_search_without_matches():
+    index = make_index()
+    assert index.search('bingo') == []
+    assert index.max_score('bingo') == 0
+    assert LexicalIndex().search('nora') == []
+
+
+def test_unknown_field():
+    with pytest.raises(ValueError):
+        LexicalIndex().update('jane', {'title': 'Jane'})
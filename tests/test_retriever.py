@@ -0,0 +1,100 @@
+import numpy as np
+import ollama
+import pytest
+
+from dementia_agent.knowledge_graph.graph import KnowledgeGraph, PersonData, EventData
+from dementia_agent.knowledge_graph.retriever import Retriever
+
+
+@pytest.fixture
+def embed_calls(monkeypatch):
+    """
+    Replace the ollama server with deterministic embeddings, recording the embedded inputs.
+    """
+    calls = []
+
+    def embed(input, model):
+        inputs = input if isinstance(input, list) else [input]
+        calls.extend(inputs)
+        return {'embeddings': [
+            np.random.default_rng(sum(map(ord, text))).normal(size=16).tolist() for text in inputs
+        ]}
+
+    monkeypatch.setattr(ollama, 'pull', lambda model: None)
+    monkeypatch.setattr(ollama, 'embed', embed)
+    return calls
+
+
+def make_graph():
+    kg = KnowledgeGraph()
+    kg.add_person('user', PersonData(name='Mary Doe', age=80))
+    kg.add_person('arthur', PersonData(name='Arthur Doe', age=59))
+    kg.add_person('jane', PersonData(name='Jane Doe', age=57))
+    kg.add_person('john', PersonData(name='John Doe', age=55))
+    kg.add_person('nurse_nora', PersonData(name='Nora', age=31))
+    kg.add_event('death_of_arthur_doe', EventData(
+        title='Death of Arthur Doe', description='The death of Arthur Doe.', time='4 years ago', day='Monday',
+        location='Hospital'
+    ))
+    kg.add_event('morning_coffee', EventData(
+        title='Morning Coffee', description='Drinking coffee with Jane.', time='10:00 AM', day='Monday',
+        location='Living Room'
+    ))
+    kg.connect('arthur', 'died_in', 'death_of_arthur_doe')
+    kg.connect('death_of_arthur_doe', 'event_of', 'arthur')
+    kg.connect('jane', 'participates_in', 'morning_coffee')
+    kg.connect('morning_coffee', 'with', 'jane')
+    kg.connect('nurse_nora', 'takes_care_of', 'user')
+    return kg
+
+
+def test_confident_lexical_match_skips_query_embedding(embed_calls):
+    retriever = Retriever(make_graph(), 'all-minilm', visualize_updates=False)
+    assert retriever.get_matching_node('Who is Nurse Nora?', top_n=2)[0] == 'nurse_nora'
+    assert retriever.get_matching_node('morning coffee', top_n=2)[0] == 'morning_coffee'
+    assert embed_calls == []
+
+
+@pytest.mark.parametrize('candidate_depth', [1, 2, 10])
+def test_ambiguous_lexical_match_falls_back_to_embeddings(embed_calls, candidate_depth):
+    retriever = Retriever(make_graph(), 'all-minilm', candidate_depth=candidate_depth, visualize_updates=False)
+    assert len(retriever.get_matching_node('Doe', top_n=2)) == 2
+    assert 'Doe' in embed_calls
+
+
+def test_is_confident(embed_calls):
+    retriever = Retriever(make_graph(), 'all-minilm', lexical_threshold=0.5, lexical_margin=1.5)
+    retriever.lexical_search('')
+    query = 'Nora'
+    max_score = retriever.lexical_index.max_score(query)
+    assert retriever.is_confident(query, [('a', max_score)], top_n=1)
+    assert retriever.is_confident(query, [('a', max_score), ('b', 0.5 * max_score)], top_n=1)
+    assert not retriever.is_confident(query, [('a', max_score), ('b', 0.9 * max_score)], top_n=1)
+    assert retriever.is_confident(query, [('a', max_score), ('b', 0.9 * max_score)], top_n=2)
+    assert not retriever.is_confident(query, [('a', 0.4 * max_score)], top_n=1)
+    assert not retriever.is_confident(query, [], top_n=1)
+
+
+@pytest.mark.parametrize('fusion', ['rrf', 'linear'])
+def test_fuse(embed_calls, fusion):
+    retriever = Retriever(make_graph(), 'all-minilm', fusion=fusion, lexical_weight=0.5)
+    lexical_nodes = [('jane', 4.0), ('john', 2.0), ('arthur', 1.0)]
+    embedding_nodes = [('john', 0.9), ('nurse_nora', 0.8), ('jane', 0.1)]
+    fused = retriever.fuse(lexical_nodes, embedding_nodes)
+    assert {node_id for node_id, _ in fused} == {'jane', 'john', 'arthur', 'nurse_nora'}
+    assert [score for _, score in fused] == sorted((score for _, score in fused), reverse=True)
+    # john ranks high in both lists, so it outranks nodes that only one of the searches found.
+    assert fused[0][0] in ('jane', 'john')
+    assert [node_id for node_id, _ in fused].index('john') < [node_id for node_id, _ in fused].index('nurse_nora')
+
+
+def test_fuse_weights_one_side_only(embed_calls):
+    retriever = Retriever(make_graph(), 'all-minilm', fusion='linear', lexical_weight=1.0)
+    fused = retriever.fuse([('jane', 4.0), ('john', 2.0)], [('nurse_nora', 0.9)])
+    assert fused[0] == ('jane', 1.0)
+    assert dict(fused)['nurse_nora'] == 0.0
+
+
+def test_invalid_fusion(embed_calls):
+    with pytest.raises(ValueError):
+        Retriever(make_graph(), 'all-minilm', fusion='max')